@@ -13,10 +13,17 @@ Usage:
       --output data.json \
       [--allow_comments] [--verbose]
 """
-import argparse, json, os, re, sys
+import argparse, json, multiprocessing, os, re, sys
 from dataclasses import dataclass
 from typing import List, Dict
 
+# orjson parses/serializes several times faster than the stdlib; use it when
+# it happens to be installed, otherwise fall back to json.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # ---------- helpers ----------
 
 # --- add near the other imports ---
@@ -49,6 +56,22 @@ def roster_from_ceremony_obj(obj, allow_from_matches=False):
 
     return None, None
 
+# name -> roster position tables, built once per roster and with interned
+# keys so repeated lookups compare pointers instead of characters
+_name_index_cache: Dict[tuple, Dict[str, int]] = {}
+
+def _name_index(names) -> Dict[str, int]:
+    key = tuple(names)
+    table = _name_index_cache.get(key)
+    if table is None:
+        table = {sys.intern(name): i for i, name in enumerate(names)}
+        _name_index_cache[key] = table
+    return table
+
+def _require_square(mat, n, where="ceremony"):
+    if len(mat) != n or any(len(row) != n for row in mat):
+        raise SystemExit(f"[ERROR] {where}: matchups must be {n}x{n}")
+
 def matchups_from_ceremony_obj(obj, men, women):
     """
     Produce an n×n 0/1 matrix from either:
@@ -62,17 +85,16 @@ def matchups_from_ceremony_obj(obj, men, women):
 
     if "matchups" in obj:
         mat = obj["matchups"]
-        if len(mat) != n or any(len(row) != n for row in mat):
-            raise SystemExit(f"[ERROR] ceremony matchups must be {n}x{n}")
+        _require_square(mat, n)
         return [list(map(int, row)) for row in mat], int(beams)
 
     if "matches" in obj and isinstance(obj["matches"], list):
-        name_to_man = {name: i for i, name in enumerate(men)}
-        name_to_woman = {name: j for j, name in enumerate(women)}
+        name_to_man = _name_index(men)
+        name_to_woman = _name_index(women)
         mat = [[0] * n for _ in range(n)]
         for pair in obj["matches"]:
-            mi = name_to_man.get((pair.get("man") or "").strip())
-            wj = name_to_woman.get((pair.get("woman") or "").strip())
+            mi = name_to_man.get(sys.intern((pair.get("man") or "").strip()))
+            wj = name_to_woman.get(sys.intern((pair.get("woman") or "").strip()))
             if mi is None or wj is None:
                 raise SystemExit(f"[ERROR] unknown name in matches: {pair!r}")
             mat[mi][wj] = 1
@@ -82,8 +104,13 @@ def matchups_from_ceremony_obj(obj, men, women):
 
 # --- helper: pull week index from filenames like "week_2.json", "booth_03.json" ---
 def _week_of(path: str) -> int:
-    m = re.search(r'(\d+)', os.path.basename(path))
-    return int(m.group(1)) if m else math.inf
+    digits = ""
+    for ch in os.path.basename(path):
+        if ch.isdigit():
+            digits += ch
+        elif digits:
+            break
+    return int(digits) if digits else math.inf
 
 def _filter_upto_week(pairs, week: int):
     """pairs is list[(path,obj)]. Keep those whose filename week <= given week."""
@@ -93,25 +120,42 @@ def _filter_upto_week(pairs, week: int):
 def _write_probabilities(problem, out_path):
     total, counts = enumerate_consistent_matchings(problem)
     n = len(problem.men)
-    probs = [[0.0] * n for _ in range(n)]
     if total > 0:
-        for i in range(n):
-            for j in range(n):
-                # keep your current output orientation
-                probs[i][j] = counts[i][j] / total
+        # keep your current output orientation
+        probs = [[c / total for c in row] for row in counts]
     else:
+        probs = [[0.0] * n for _ in range(n)]
         print("[ERROR] No consistent matchings exist; writing zeros.", file=sys.stderr)
     out = {"men": problem.men, "women": problem.women, "probabilities": probs}
-    with open(out_path, "w", encoding="utf-8") as fh:
-        json.dump(out, fh, indent=2)
+    _dump_json(out, out_path)
+    return out_path, total
+
+# --- worker for one week; top-level so multiprocessing can pickle it ---
+def _split_week_job(args):
+    w, ceremony_objs, truth_objs, first_pair, out_prefix = args
+    # ceremonies/truth up to and including week w
+    cer_upto_w = _filter_upto_week(ceremony_objs, w)
+    tb_upto_w  = _filter_upto_week(truth_objs, w)
+
+    if w == 0:
+        # Build problem with NO ceremony constraints (uniform unless truth booths exist for week 0)
+        # We still need allowed/forced from truth booths (if any)
+        # Reuse build_problem to apply truth booths, then drop ceremonies.
+        prob = build_problem([first_pair], tb_upto_w)
+        prob.ceremonies = []  # remove constraints → week 0 becomes “equal for everyone” if no TBs
+    else:
+        prob = build_problem(cer_upto_w, tb_upto_w)
+
+    out_path = f"{out_prefix}_week_{w}.json"
+    _, total = _write_probabilities(prob, out_path)
     return out_path, total
 
 # --- new: split-by-week driver ---
 def compute_probabilities_split_weeks(ceremony_dir: str, truth_dir: str, out_prefix: str, *,
                                       allow_comments: bool, verbose: bool):
     # Load everything once
-    ceremony_objs = load_json_files(ceremony_dir, r"week_.*\.json", allow_comments=allow_comments, verbose=verbose)
-    truth_objs    = load_json_files(truth_dir,    r"booth_.*\.json", allow_comments=allow_comments, verbose=verbose)
+    ceremony_objs = load_json_files(ceremony_dir, "week_", allow_comments=allow_comments, verbose=verbose)
+    truth_objs    = load_json_files(truth_dir,    "booth_", allow_comments=allow_comments, verbose=verbose)
     if not ceremony_objs:
         raise SystemExit("[ERROR] No ceremony files found (needed for roster).")
 
@@ -122,23 +166,19 @@ def compute_probabilities_split_weeks(ceremony_dir: str, truth_dir: str, out_pre
 
     max_week = max((_week_of(p) for (p, _) in ceremony_objs if _week_of(p) != math.inf), default=0)
 
-    written = []
-    for w in range(0, max_week + 1):
-        # ceremonies/truth up to and including week w
-        cer_upto_w = _filter_upto_week(ceremony_objs, w)
-        tb_upto_w  = _filter_upto_week(truth_objs, w)
-
-        if w == 0:
-            # Build problem with NO ceremony constraints (uniform unless truth booths exist for week 0)
-            # We still need allowed/forced from truth booths (if any)
-            # Reuse build_problem to apply truth booths, then drop ceremonies.
-            prob = build_problem([ (first_path, first_obj) ], tb_upto_w)
-            prob.ceremonies = []  # remove constraints → week 0 becomes “equal for everyone” if no TBs
-        else:
-            prob = build_problem(cer_upto_w, tb_upto_w)
+    # Weeks are independent, so fan them out across processes. The loaded
+    # (path, obj) lists are plain JSON data and pickle cleanly.
+    jobs = [(w, ceremony_objs, truth_objs, (first_path, first_obj), out_prefix)
+            for w in range(0, max_week + 1)]
+    if len(jobs) > 1:
+        procs = min(len(jobs), os.cpu_count() or 1)
+        with multiprocessing.Pool(procs) as pool:
+            results = pool.map(_split_week_job, jobs)
+    else:
+        results = [_split_week_job(job) for job in jobs]
 
-        out_path = f"{out_prefix}_week_{w}.json"
-        _, total = _write_probabilities(prob, out_path)
+    written = []
+    for out_path, total in results:
         if verbose:
             print(f"[split] Wrote {out_path} (solutions counted: {total})")
         written.append(out_path)
@@ -147,8 +187,8 @@ def compute_probabilities_split_weeks(ceremony_dir: str, truth_dir: str, out_pre
 def compute_probabilities_for_week(ceremony_dir: str, truth_dir: str, out_prefix: str, week: int, *,
                                    allow_comments: bool, verbose: bool):
     # Load once
-    ceremony_objs = load_json_files(ceremony_dir, r"week_.*\.json", allow_comments=allow_comments, verbose=verbose)
-    truth_objs    = load_json_files(truth_dir,    r"booth_.*\.json", allow_comments=allow_comments, verbose=verbose)
+    ceremony_objs = load_json_files(ceremony_dir, "week_", allow_comments=allow_comments, verbose=verbose)
+    truth_objs    = load_json_files(truth_dir,    "booth_", allow_comments=allow_comments, verbose=verbose)
     if not ceremony_objs:
         raise SystemExit("[ERROR] No ceremony files found (needed for roster).")
 
@@ -201,6 +241,14 @@ def _decomment(s: str) -> str:
     s = re.sub(r"/\*.*?\*/", "", s, flags=re.S)
     return s
 
+def _dump_json(obj, path: str):
+    if orjson is not None:
+        with open(path, "wb") as fh:
+            fh.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(obj, fh, indent=2)
+
 def read_json_file(path: str, allow_comments: bool):
     with open(path, "r", encoding="utf-8") as fh:
         raw = fh.read()
@@ -210,17 +258,28 @@ def read_json_file(path: str, allow_comments: bool):
     if allow_comments:
         cleaned = _decomment(cleaned)
     try:
-        return json.loads(cleaned)
+        # orjson.JSONDecodeError subclasses json.JSONDecodeError
+        return orjson.loads(cleaned) if orjson is not None else json.loads(cleaned)
     except json.JSONDecodeError as e:
         # show a more actionable error with context
         msg = f"Invalid JSON in {path}: {e.msg} at line {e.lineno} col {e.colno}"
         raise ValueError(msg) from e
 
-def load_json_files(folder: str, pattern: str, *, allow_comments: bool, verbose: bool):
+# Parsed (path, obj) lists keyed by (folder, prefix, allow_comments) so the
+# split-week drivers don't re-read and re-parse the same files for every week.
+_load_cache: Dict[tuple, list] = {}
+
+def load_json_files(folder: str, prefix: str, *, allow_comments: bool, verbose: bool):
     if not folder or not os.path.isdir(folder):
         return []
-    pat = re.compile(pattern, re.IGNORECASE)
-    files = sorted([f for f in os.listdir(folder) if pat.fullmatch(f)], key=natural_key)
+    cache_key = (os.path.abspath(folder), prefix, allow_comments)
+    cached = _load_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    prefix = prefix.lower()
+    files = sorted([f for f in os.listdir(folder)
+                    if f.lower().startswith(prefix) and f.lower().endswith(".json")],
+                   key=natural_key)
     objs = []
     for fname in files:
         path = os.path.join(folder, fname)
@@ -231,6 +290,7 @@ def load_json_files(folder: str, pattern: str, *, allow_comments: bool, verbose:
         except Exception as e:
             # stop immediately with the precise filename and reason
             raise SystemExit(f"[ERROR] {e}")
+    _load_cache[cache_key] = objs
     return objs
 
 def parse_truth_result(val) -> str:
@@ -242,8 +302,9 @@ def parse_truth_result(val) -> str:
         return "match" if bool(val) else "no match"
     raise ValueError(f"Unrecognized truth booth result: {val!r}")
 
-def popcount(x: int) -> int:
-    return x.bit_count() if hasattr(int, "bit_count") else bin(x).count("1")
+# int.bit_count exists on every Python we run (3.10+); bind it once instead
+# of paying a hasattr check per call.
+popcount = int.bit_count
 
 # ---------- data shapes ----------
 
@@ -283,11 +344,9 @@ def build_problem(ceremony_objs, truth_objs) -> Problem:
                 raise SystemExit(f"[ERROR] {path}: men/women differ from earlier ceremony file(s)")
 
         # Build the matrix from either format using the fixed roster
+        # matchups_from_ceremony_obj validates the shape (the 'matches'
+        # branch constructs an n×n matrix by construction)
         mat, beams = matchups_from_ceremony_obj(obj, men, women)
-
-        n = len(men)
-        if len(mat) != n or any(len(row) != n for row in mat):
-            raise SystemExit(f"[ERROR] {path}: matchups must be {n}x{n}")
         ceremonies.append(Ceremony(matchups=mat, beams=int(beams)))
 
     if men is None or women is None:
@@ -296,13 +355,13 @@ def build_problem(ceremony_objs, truth_objs) -> Problem:
     # Truth booths → allowed/forced (unchanged except for .strip())
     n = len(men)
     allowed = [(1 << n) - 1 for _ in range(n)]
-    name_to_man = {name: i for i, name in enumerate(men)}
-    name_to_woman = {name: j for j, name in enumerate(women)}
+    name_to_man = _name_index(men)
+    name_to_woman = _name_index(women)
     forced_pairs: Dict[int, int] = {}
 
     for path, obj in truth_objs:
-        man = (obj.get("man") or "").strip()
-        woman = (obj.get("woman") or "").strip()
+        man = sys.intern((obj.get("man") or "").strip())
+        woman = sys.intern((obj.get("woman") or "").strip())
         if man not in name_to_man or woman not in name_to_woman:
             raise SystemExit(f"[ERROR] {path}: unknown names {man!r}, {woman!r}")
         i = name_to_man[man]; j = name_to_woman[woman]
@@ -318,10 +377,10 @@ def build_problem(ceremony_objs, truth_objs) -> Problem:
     for i, j in list(forced_pairs.items()):
         if (allowed[i] & (1 << j)) == 0:
             raise SystemExit(f"[ERROR] Forced pair {men[i]}–{women[j]} contradicts a 'no match'")
+        # clear woman j for everyone in one pass, then re-grant her to man i
+        keep = ~(1 << j)
+        allowed = [a & keep for a in allowed]
         allowed[i] = (1 << j)
-        for ii in range(n):
-            if ii != i:
-                allowed[ii] &= ~(1 << j)
         for ii, jj in list(forced_pairs.items()):
             if ii != i and jj == j:
                 raise SystemExit(f"[ERROR] Two forced pairs use woman {women[j]}")
@@ -338,19 +397,18 @@ def enumerate_consistent_matchings(problem: Problem):
     men, women = problem.men, problem.women
     n = len(men)
 
-    C = []
-    beams = []
-    for cer in problem.ceremonies:
-        row_masks = []
-        for i in range(n):
-            mask = 0
-            for j, val in enumerate(cer.matchups[i]):
-                if val: mask |= (1 << j)
-            row_masks.append(mask)
-        C.append(row_masks)
-        beams.append(cer.beams)
+    C = [[sum(1 << j for j, val in enumerate(row) if val) for row in cer.matchups]
+         for cer in problem.ceremonies]
+    beams = [cer.beams for cer in problem.ceremonies]
+
+    # Transpose of C: bit k of hits_ij[i][j] is set iff ceremony k marks i↔j.
+    nC = len(C)
+    hits_ij = [[sum(((C[k][i] >> j) & 1) << k for k in range(nC))
+                for j in range(n)] for i in range(n)]
 
     allowed = problem.allowed[:]
+    # Column view of allowed: bit i of allow_col[j] is set iff man i may take woman j.
+    allow_col = [sum(((allowed[i] >> j) & 1) << i for i in range(n)) for j in range(n)]
     assignment = [-1] * n
     taken_mask = 0
 
@@ -371,95 +429,207 @@ def enumerate_consistent_matchings(problem: Problem):
         if sofar[k] > beams[k]:
             return 0, [[0] * n for _ in range(n)]  # impossible already
 
+    # Forced pairs pin every man → the matching is fully determined; just
+    # check it satisfies each ceremony exactly instead of searching.
+    if all(j != -1 for j in assignment):
+        if any(sofar[k] != beams[k] for k in range(nC)):
+            return 0, [[0] * n for _ in range(n)]
+        pair_counts = [[0] * n for _ in range(n)]
+        for i in range(n):
+            pair_counts[i][assignment[i]] = 1
+        return 1, pair_counts
+
+    # Pack per-ceremony counters into 8-bit lanes of a single int so that
+    # incrementing all ceremonies for a chosen pair is one addition, and
+    # "any lane exceeds its beam count" is one SWAR test. Lane values stay
+    # below 128 (counts and beams are at most n), so lanes cannot carry.
+    beams_packed = 0
+    beams_cmp = 0
+    lane_high = 0
+    for k in range(nC):
+        beams_packed |= beams[k] << (8 * k)
+        beams_cmp |= (0x7F - beams[k]) << (8 * k)
+        lane_high |= 0x80 << (8 * k)
+    inc_packed = [[sum(((hits_ij[i][j] >> k) & 1) << (8 * k) for k in range(nC))
+                   for j in range(n)] for i in range(n)]
+    sofar_packed0 = sum(sofar[k] << (8 * k) for k in range(nC))
+
     order = list(range(n))
     def domain_size(i): return 1 if assignment[i] != -1 else popcount(allowed[i] & ~taken_mask)
     order.sort(key=domain_size)
 
-    total = 0
+    # Static ceiling on further hits per ceremony for each suffix of order:
+    # lane k of maxrem_packed[idx] counts men at positions >= idx whose
+    # allowed women include someone ceremony k seated them with. Forced men
+    # are counted even though their hit is already in sofar; the value is
+    # only an upper bound, so that merely weakens the prune, never breaks it.
+    maxrem_packed = [0] * (n + 1)
+    for idx in range(n - 1, -1, -1):
+        i = order[idx]
+        add = 0
+        for k in range(nC):
+            if C[k][i] & allowed[i]:
+                add |= 1 << (8 * k)
+        maxrem_packed[idx] = maxrem_packed[idx + 1] + add
+    # lane k of sofar + maxrem + beams_geq has its high bit set iff the beam
+    # total is still reachable for ceremony k
+    beams_geq = sum((0x80 - beams[k]) << (8 * k) for k in range(nC))
+
     pair_counts = [[0] * n for _ in range(n)]
 
-    def ub_additional(k, avail_mask, unassigned_men):
+    def ub_additional(k, avail_mask, unassigned_mask):
         ub = 0; row_masks = C[k]
-        for i in unassigned_men:
+        m = unassigned_mask
+        while m:
+            i = (m & -m).bit_length() - 1
+            m &= m - 1
             if (row_masks[i] & allowed[i] & avail_mask) != 0:
                 ub += 1
         return ub
 
-    def dfs(idx, taken_mask, sofar, unassigned_men):
-        nonlocal total, pair_counts
+    # Subtree results keyed by (idx, taken_mask, sofar_packed): identical
+    # states reached via different prefixes share one evaluation. A result
+    # is (subtotal, counts) where counts is a flat n*n list covering pairs
+    # chosen at this depth or below (None when subtotal is 0, and at leaves,
+    # which contribute no pairs of their own).
+    memo = {}
+
+    nn = n * n
+
+    def expand(idx, taken_mask, sofar_packed, unassigned_mask):
+        """Evaluate one state: return ('val', result) when it resolves
+        immediately (leaf, memo hit, or pruned to nothing), otherwise
+        ('frame', [key, edges, next_edge, acc_total, acc_counts]) where
+        edges is the list of surviving (pair_index, child_state) branches."""
         if idx == len(order):
-            for k in range(len(C)):
-                if sofar[k] != beams[k]: return
-            total += 1
-            for i in range(n):
-                pair_counts[i][assignment[i]] += 1
-            return
+            return 'val', (1 if sofar_packed == beams_packed else 0, None)
+
+        key = (idx, taken_mask, sofar_packed)
+        hit = memo.get(key)
+        if hit is not None:
+            return 'val', hit
+
+        # some ceremony can no longer reach its beam total even if every
+        # remaining man hits it → the whole subtree is dead
+        if ((sofar_packed + maxrem_packed[idx] + beams_geq) & lane_high) != lane_high:
+            memo[key] = (0, None)
+            return 'val', (0, None)
 
         i = order[idx]
+        edges = []
         if assignment[i] != -1:
-            avail_mask = ~taken_mask & ((1 << n) - 1)
-            for k in range(len(C)):
-                if sofar[k] > beams[k]: return
-                if sofar[k] + ub_additional(k, avail_mask, [ii for ii in unassigned_men if assignment[ii] == -1]) < beams[k]:
-                    return
-            dfs(idx + 1, taken_mask, sofar, unassigned_men)
-            return
-
-        candidates_mask = allowed[i] & (~taken_mask)
-        if candidates_mask == 0: return
-        cand_js = [j for j in range(n) if (candidates_mask >> j) & 1]
-
-        def score(j):
-            hits = sum(1 for k in range(len(C)) if (C[k][i] >> j) & 1)
-            fanout = sum(1 for ii in unassigned_men if assignment[ii] == -1 and ((allowed[ii] >> j) & 1))
-            return (-hits, fanout)
-        cand_js.sort(key=score)
-
-        for j in cand_js:
-            inc = [0] * len(C); ok = True
-            for k in range(len(C)):
-                if (C[k][i] >> j) & 1:
-                    inc[k] = 1
-                    if sofar[k] + 1 > beams[k]: ok = False; break
-            if not ok: continue
-
-            next_taken = taken_mask | (1 << j)
-            avail_mask = ~next_taken & ((1 << n) - 1)
-            for k in range(len(C)):
-                if sofar[k] + inc[k] + ub_additional(k, avail_mask, [ii for ii in unassigned_men if assignment[ii] == -1 and ii != i]) < beams[k]:
-                    ok = False; break
-            if not ok: continue
-
-            assignment[i] = j
-            for k in range(len(C)): sofar[k] += inc[k]
-            dfs(idx + 1, next_taken, sofar, unassigned_men)
-            for k in range(len(C)): sofar[k] -= inc[k]
-            assignment[i] = -1
-
-    unassigned = [i for i in range(n) if assignment[i] == -1]
-    dfs(0, taken_mask, sofar[:], unassigned)
+            if not ((sofar_packed + beams_cmp) & lane_high):
+                avail_mask = ~taken_mask & ((1 << n) - 1)
+                for k in range(nC):
+                    if ((sofar_packed >> (8 * k)) & 0xFF) + ub_additional(k, avail_mask, unassigned_mask) < beams[k]:
+                        break
+                else:
+                    edges.append((i * n + assignment[i],
+                                  (idx + 1, taken_mask, sofar_packed, unassigned_mask)))
+        else:
+            candidates_mask = allowed[i] & (~taken_mask)
+            if candidates_mask:
+                # walk set bits directly (lowest first) instead of testing all n positions
+                cand_js = []
+                m = candidates_mask
+                while m:
+                    cand_js.append((m & -m).bit_length() - 1)
+                    m &= m - 1
+
+                hits_i = hits_ij[i]
+
+                def score(j):
+                    return (-popcount(hits_i[j]), popcount(allow_col[j] & unassigned_mask))
+                cand_js.sort(key=score)
+
+                inc_i = inc_packed[i]
+                for j in cand_js:
+                    next_sofar = sofar_packed + inc_i[j]
+                    if (next_sofar + beams_cmp) & lane_high: continue
+
+                    next_taken = taken_mask | (1 << j)
+                    next_unassigned = unassigned_mask & ~(1 << i)
+                    avail_mask = ~next_taken & ((1 << n) - 1)
+                    ok = True
+                    for k in range(nC):
+                        if ((next_sofar >> (8 * k)) & 0xFF) + ub_additional(k, avail_mask, next_unassigned) < beams[k]:
+                            ok = False; break
+                    if not ok: continue
+                    edges.append((i * n + j,
+                                  (idx + 1, next_taken, next_sofar, next_unassigned)))
+
+        if not edges:
+            memo[key] = (0, None)
+            return 'val', (0, None)
+        return 'frame', [key, edges, 0, 0, None]
+
+    def dfs(idx, taken_mask, sofar_packed, unassigned_mask):
+        # Explicit stack of frames instead of Python recursion: no per-node
+        # call-frame setup, and depth is bounded only by len(order).
+        kind, out = expand(idx, taken_mask, sofar_packed, unassigned_mask)
+        if kind == 'val':
+            return out
+        stack = [out]
+        result = None
+        while stack:
+            frame = stack[-1]
+            if result is not None:
+                # fold the just-finished child (edge next_edge-1) into frame
+                t, c = result
+                result = None
+                if t:
+                    frame[3] += t
+                    acc = frame[4]
+                    if acc is None:
+                        acc = frame[4] = [0] * nn
+                    if c is not None:
+                        for p in range(nn):
+                            acc[p] += c[p]
+                    acc[frame[1][frame[2] - 1][0]] += t
+            edges = frame[1]
+            if frame[2] < len(edges):
+                child_state = edges[frame[2]][1]
+                frame[2] += 1
+                kind, out = expand(*child_state)
+                if kind == 'val':
+                    result = out
+                else:
+                    stack.append(out)
+            else:
+                result = (frame[3], frame[4])
+                memo[frame[0]] = result
+                stack.pop()
+        return result
+
+    unassigned_mask0 = 0
+    for i in range(n):
+        if assignment[i] == -1:
+            unassigned_mask0 |= (1 << i)
+    total, counts_flat = dfs(0, taken_mask, sofar_packed0, unassigned_mask0)
+    if counts_flat is not None:
+        for i in range(n):
+            row = pair_counts[i]
+            for j in range(n):
+                row[j] = counts_flat[i * n + j]
     return total, pair_counts
 
 # ---------- public API ----------
 
 def compute_probabilities(ceremony_dir: str, truth_dir: str, out_path: str, *, allow_comments: bool, verbose: bool):
-    ceremony_objs = load_json_files(ceremony_dir, r"week_.*\.json", allow_comments=allow_comments, verbose=verbose)
-    truth_objs    = load_json_files(truth_dir,    r"booth_.*\.json", allow_comments=allow_comments, verbose=verbose)
+    ceremony_objs = load_json_files(ceremony_dir, "week_", allow_comments=allow_comments, verbose=verbose)
+    truth_objs    = load_json_files(truth_dir,    "booth_", allow_comments=allow_comments, verbose=verbose)
     if not ceremony_objs and not truth_objs:
         raise SystemExit("[ERROR] No input files found.")
     problem = build_problem(ceremony_objs, truth_objs)
     total, counts = enumerate_consistent_matchings(problem)
     n = len(problem.men)
-    probs = [[0.0] * n for _ in range(n)]
     if total > 0:
-        for i in range(n):
-            for j in range(n):
-                probs[i][j] = counts[i][j] / total
+        probs = [[c / total for c in row] for row in counts]
     else:
+        probs = [[0.0] * n for _ in range(n)]
         print("[ERROR] No consistent matchings exist; writing zeros.", file=sys.stderr)
     out = {"men": problem.men, "women": problem.women, "probabilities": probs}
-    with open(out_path, "w", encoding="utf-8") as fh:
-        json.dump(out, fh, indent=2)
+    _dump_json(out, out_path)
     return out_path, total
 
 def main():